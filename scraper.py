@@ -1,72 +1,349 @@
 import time
-import json
 import random
 import os
+import re
+import mmap
 import logging
-from typing import Optional, Dict, List, Set
+import threading
+import queue
+from typing import Optional, Dict, List, Tuple, Set, Iterable
+import orjson
+import xxhash
+import urllib3
 import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 
 # --- CONFIGURATION ---
 OUTPUT_FILE = "output.jsonl"
 LOG_FILE = "scraper.log"
 TARGET_URL = "https://scraping-trial-test.vercel.app/"
 MAX_RETRIES = 3
+ROW_WAIT_TIMEOUT = 30  # Seconds to wait for table rows on each attempt
+RETRY_BACKOFF = 0.5  # Seconds before the second attempt; doubles on each further one
+BASE_DELAY = 3.0  # Seconds between pages after a throttling sign
+MIN_DELAY = 0.2  # Floor the delay decays towards while pages load cleanly
+DELAY_DECAY = 0.9  # Per clean page multiplier applied to BASE_DELAY
+DELAY_JITTER = 0.3  # Random extra seconds so requests never land on a fixed beat
+WRITE_QUEUE_SIZE = 100  # Pages waiting for the writer thread before the scraper blocks
+HEADLESS = False  # The manual reCAPTCHA gate needs a visible browser window
+PROFILE_DIR = ".uc_profile"  # Persistent Chrome profile so the session survives restarts
+SESSION_CHECK_TIMEOUT = 10  # Seconds to wait for results when re-using a saved session
+# Requests not needed for text extraction; blocked only after the manual gate,
+# since the reCAPTCHA challenge itself relies on images and stylesheets.
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.css", "*.mp4", "*.webm",
+    "*analytics*", "*googletagmanager*", "*doubleclick*",
+]
+
+# Pulls the raw (still JSON-escaped) business_name out of a record line without a full parse
+_NAME_RE = re.compile(rb'"business_name"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+# Pre-rendered JSONL layouts for the fixed record schema; fields are filled with orjson-encoded strings
+_RECORD_TEMPLATE = (
+    b'{"business_name":%s,"registration_id":%s,"status":%s,"filing_date":%s,"agent_details":%s}\n'
+)
+_RECORD_WITH_AGENT_TEMPLATE = (
+    b'{"business_name":%s,"registration_id":%s,"status":%s,"filing_date":%s,"agent_details":%s,'
+    b'"agent_name":%s,"agent_address":%s,"agent_email":%s}\n'
+)
+
+# --- IN-PAGE SCRIPTS ---
+# Run directly through CDP, bypassing chromedriver's per-command marshaling. Each one is compiled
+# once per document (Runtime.compileScript) and replayed by id, so V8 does not re-parse it per page.
+
+# Waits for the table and serializes every row's cell texts in the same call. Rows marked by
+# JS_CLICK_NEXT count as the previous page, so it resolves only once they are replaced or their text
+# changes (pushed by a MutationObserver, no polling), or with no rows once ROW_WAIT_TIMEOUT elapses.
+# "stale" flags a table that never changed. "throttled" flags rate-limit or captcha text, looked for
+# only in a visible modal overlay or in the element that held the table once its rows are gone, so the
+# search form's own reCAPTCHA text elsewhere on the page is not mistaken for throttling.
+# textContent is used so hidden or deeply nested text is still captured.
+JS_EXTRACT_ALL_ROWS = """
+new Promise(resolve => {
+    const staleRow = window.__eniStaleRow, staleText = window.__eniStaleText;
+    const fresh = () => {
+        const tr = document.querySelector('table tbody tr');
+        return !!tr && (tr !== staleRow || tr.parentNode.textContent !== staleText);
+    };
+    const extract = () => {
+        const table = document.querySelector('table');
+        if (table && table.parentElement !== document.body) window.__eniTableHost = table.parentElement;
+        return Array.from(document.querySelectorAll('table tbody tr'))
+            .map(tr => Array.from(tr.cells).map(td => td.textContent.trim()));
+    };
+    const blockedText = /too many requests|rate limit|unusual traffic|verify you are human|captcha/i;
+    const throttled = () => {
+        const overlays = Array.from(document.querySelectorAll('[role="dialog"], [role="alertdialog"], [aria-modal="true"]'))
+            .filter(e => e.getClientRects().length);
+        const host = window.__eniTableHost;
+        if (host && host.isConnected && !host.querySelector('table tbody tr')) overlays.push(host);
+        return overlays.some(e => blockedText.test(e.innerText));
+    };
+    let observer = null, timer = null;
+    const finish = rows => {
+        if (observer) observer.disconnect();
+        clearTimeout(timer);
+        resolve({
+            rows: rows,
+            stale: !rows.length && !!document.querySelector('table tbody tr'),
+            throttled: !rows.length && throttled(),
+        });
+    };
+    if (fresh()) return finish(extract());
+    observer = new MutationObserver(() => { if (fresh()) finish(extract()); });
+    observer.observe(document.documentElement, {childList: true, subtree: true, characterData: true});
+    timer = setTimeout(() => finish([]), %d);
+})
+""" % (ROW_WAIT_TIMEOUT * 1000)
+
+# Clicks the Next button; evaluates to false when pagination is exhausted.
+# The button is found with a plain CSS scan (no XPath) and cached on window until the page re-renders it.
+# The current rows are marked first so JS_EXTRACT_ALL_ROWS can tell them apart from the next page.
+JS_CLICK_NEXT = """
+(() => {
+    let b = window.__eniNextButton;
+    if (!b || !b.isConnected) {
+        b = [...document.querySelectorAll('button')].find(e => /next|›|>/i.test(e.textContent));
+        window.__eniNextButton = b;
+    }
+    if (!b || b.disabled) return false;
+    const tr = document.querySelector('table tbody tr');
+    window.__eniStaleRow = tr;
+    window.__eniStaleText = tr ? tr.parentNode.textContent : null;
+    b.click();
+    return true;
+})()
+"""
 
 # --- LOGGING SETUP ---
 # Requirement: Include logging of errors or important events to a log file
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
+    format="%(asctime)s [%(levelname)s] [%(threadName)s] %(message)s",
     handlers=[
         logging.FileHandler(LOG_FILE),
         logging.StreamHandler()  # This also prints to console
     ]
 )
 
-class EniScraper:
+class ScrapedIndex:
     """
-    A robust Selenium scraper designed to extract business data with
-    resume capability, retry logic, and stealth mechanisms.
+    Membership index of scraped business names, keyed by 64-bit xxhash digests
+    so every entry is a fixed-width int rather than a variable-length string.
     """
 
     def __init__(self):
-        self.driver = None
-        self.scraped_ids: Set[str] = self.load_existing_progress()
+        self._keys: Set[int] = set()
+
+    @staticmethod
+    def key(name: str) -> int:
+        return xxhash.xxh64_intdigest(name.encode('utf-8'))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def unseen(self, keys: Iterable[int]) -> Set[int]:
+        """Keys not yet in the index, as one C-level set difference."""
+        return set(keys).difference(self._keys)
+
+    def add(self, key: int):
+        self._keys.add(key)
+
+    def update(self, keys: Iterable[int]):
+        self._keys.update(keys)
+
+    def discard(self, keys: Iterable[int]):
+        self._keys.difference_update(keys)
+
+class RecordStore:
+    """
+    JSONL sink for the scraper.
+    Dedup runs under one lock shared with the writer thread, which releases names it failed to write;
+    disk writes happen on that background writer thread, which alone owns
+    the append-only output descriptor, so scraping never waits on I/O.
+    """
+
+    _STOP = object()  # Queue sentinel telling the writer thread to finish
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._out_fd: Optional[int] = None
+        self._queue: queue.Queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._writer: Optional[threading.Thread] = None
+        self.scraped_ids: ScrapedIndex = self.load_existing_progress()
         logging.info(f"Initialized Scraper. Found {len(self.scraped_ids)} existing records.")
 
-    def load_existing_progress(self) -> Set[str]:
+    def load_existing_progress(self) -> ScrapedIndex:
         """
         Bonus Feature: Resume Capability.
-        Reads the output file to populate a set of already scraped business names.
+        Reads the output file to populate an index of already scraped business names.
+        Only the business_name field is extracted per line; full parsing is a fallback.
+        The file is memory-mapped and scanned in place, so no per-line objects are allocated.
         """
-        ids = set()
-        if os.path.exists(OUTPUT_FILE):
+        ids = ScrapedIndex()
+        if os.path.exists(OUTPUT_FILE) and os.path.getsize(OUTPUT_FILE):
             try:
-                with open(OUTPUT_FILE, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        if line.strip():
-                            try:
-                                data = json.loads(line)
-                                ids.add(data.get("business_name")) 
-                            except json.JSONDecodeError:
-                                logging.warning("Skipped malformed line in output file.")
+                with open(OUTPUT_FILE, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    pos, size = 0, len(mm)
+                    while pos < size:
+                        end = mm.find(b"\n", pos)
+                        if end == -1:
+                            end = size
+                        try:
+                            key = self._extract_key(mm, pos, end)
+                            if key is not None:
+                                ids.add(key)
+                        except orjson.JSONDecodeError:
+                            logging.warning("Skipped malformed line in output file.")
+                        pos = end + 1
             except Exception as e:
                 logging.error(f"Failed to load progress: {e}")
         return ids
 
+    @staticmethod
+    def _extract_key(buf, start: int, end: int) -> Optional[int]:
+        """
+        Returns the index key of the business_name in the JSONL line buf[start:end].
+        Unescaped names are hashed straight from their UTF-8 bytes; blank lines and
+        records without a name yield None.
+        """
+        m = _NAME_RE.search(buf, start, end)
+        if not m:
+            line = buf[start:end]
+            name = orjson.loads(line).get("business_name") if line.strip() else None
+            return ScrapedIndex.key(name) if name is not None else None
+        raw = m.group(1)
+        if b"\\" in raw:
+            return ScrapedIndex.key(orjson.loads(b'"' + raw + b'"'))
+        return xxhash.xxh64_intdigest(raw)
+
+    def open(self):
+        """Opens the output file once as a raw O_APPEND descriptor and starts the writer thread."""
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0)
+        self._out_fd = os.open(OUTPUT_FILE, flags, 0o644)
+        self._writer = threading.Thread(target=self._write_loop, name="writer", daemon=True)
+        self._writer.start()
+
+    def save_page(self, records: List[Tuple[str, bytes]]) -> int:
+        """
+        Queues a page's worth of new (business_name, JSONL line) records for the writer thread.
+        Updates the in-memory index to prevent duplicates during this run; if the page
+        later fails to write, the writer releases its names again so they can be re-scraped.
+        Returns the number of new records queued.
+        """
+        keys = [ScrapedIndex.key(name) for name, _ in records]
+        with self._lock:
+            fresh = self.scraped_ids.unseen(keys)
+            self.scraped_ids.update(fresh)
+
+        new_records = []
+        for key, record in zip(keys, records):
+            if key in fresh:
+                fresh.discard(key)  # Keep only the first of any repeats within the page
+                new_records.append(record)
+
+        if new_records:
+            try:
+                self._enqueue(new_records)
+            except RuntimeError:
+                self._release(new_records)
+                raise
+        return len(new_records)
+
+    def _enqueue(self, item):
+        """Blocking put that gives up once the writer thread is gone instead of waiting forever."""
+        while True:
+            if not (self._writer and self._writer.is_alive()):
+                raise RuntimeError("Record writer thread is not running.")
+            try:
+                self._queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def _release(self, records: List[Tuple[str, bytes]]):
+        """Forgets the names of records that never reached disk, so later sightings are written."""
+        with self._lock:
+            self.scraped_ids.discard(ScrapedIndex.key(name) for name, _ in records)
+
+    def _write_loop(self):
+        """Writer thread: appends each queued page of pre-rendered lines in one write call."""
+        while True:
+            records = self._queue.get()
+            if records is self._STOP:
+                return
+            try:
+                self._write_all([line for _, line in records])
+            except Exception as e:
+                # Keep the thread alive: a dead writer would leave the scraper blocked on the queue
+                logging.error(f"Failed to write {len(records)} records, they will be re-scraped: {e}")
+                self._release(records)
+                continue
+            for name, _ in records:
+                logging.info(f"Successfully scraped: {name}")
+
+    def _write_all(self, parts: List[bytes]):
+        """Appends the chunks as one joined os.write, looping only on a short write."""
+        view = memoryview(b"".join(parts))
+        while view:
+            view = view[os.write(self._out_fd, view):]
+
+    def close(self):
+        """Drains the queue, stops the writer thread and closes the output descriptor."""
+        if self._writer:
+            try:
+                self._enqueue(self._STOP)
+            except RuntimeError:
+                logging.error("Record writer thread stopped early; queued records were not written.")
+            self._writer.join()
+            self._writer = None
+        if self._out_fd is not None:
+            os.close(self._out_fd)
+            self._out_fd = None
+
+class EniScraper:
+    """
+    A robust Selenium scraper designed to extract business data with
+    resume capability, retry logic, and stealth mechanisms.
+    """
+
+    def __init__(self, store: RecordStore):
+        self.store = store
+        self.driver = None
+        self._consecutive_ok = 0
+        self._script_ids: Dict[str, str] = {}
+
     def setup_driver(self):
         """Initializes the undetected_chromedriver with stealth options."""
         logging.info("Setting up Chrome driver...")
         options = uc.ChromeOptions()
         options.add_argument("--window-size=1920,1080")
         options.add_argument("--disable-popup-blocking")
-        # options.add_argument("--headless") # Uncomment if GUI is not needed
+        options.add_argument(f"--user-data-dir={os.path.abspath(PROFILE_DIR)}")
+        options.add_argument("--profile-directory=Default")
+        # Trim background work Chrome does that a text scrape never needs
+        options.add_argument("--disable-gpu")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--disable-background-networking")
+        options.add_argument("--disable-background-timer-throttling")
+        options.add_argument("--disable-backgrounding-occluded-windows")
+        options.add_argument("--disable-renderer-backgrounding")
+        options.add_argument("--mute-audio")
+        options.add_argument("--hide-scrollbars")
+        if HEADLESS:
+            options.add_argument("--headless=new")
         try:
-            self.driver = uc.Chrome(options=options)
+            # keep_alive reuses one pooled HTTP connection to chromedriver for every command
+            # instead of opening a new socket per WebDriver call.
+            self.driver = uc.Chrome(options=options, keep_alive=True)
+            if not isinstance(getattr(self.driver.command_executor, "_conn", None), urllib3.PoolManager):
+                logging.warning("Command executor is not using a pooled HTTP connection.")
             self.wait = WebDriverWait(self.driver, 30)
             logging.info("Driver started successfully.")
         except Exception as e:
@@ -76,11 +353,13 @@ class EniScraper:
     def human_bypass_gate(self):
         """
         Pauses execution to allow manual handling of reCAPTCHA and Search initiation.
+        Skipped when the persistent profile still holds a session that can search on its own.
         """
         logging.info("Navigating to target URL for manual interaction.")
         self.driver.get(TARGET_URL)
         
         # Attempt to pre-fill search box for convenience
+        search_box = None
         try:
             search_box = self.wait.until(EC.element_to_be_clickable((By.ID, "q")))
             search_box.click()
@@ -90,6 +369,10 @@ class EniScraper:
         except TimeoutException:
             logging.warning("Could not auto-focus search box. Please check manually.")
 
+        if search_box and self.driver.get_cookies() and self.resume_session(search_box):
+            logging.info("Saved session accepted the search. Skipping manual bypass.")
+            return
+
         print("\n" + "="*60)
         print("ACTION REQUIRED: MANUAL BYPASS")
         print("1. Solve the reCAPTCHA in the browser.")
@@ -100,111 +383,194 @@ class EniScraper:
         input("Press ENTER in this terminal once the data table is visible...")
         logging.info("User confirmed table visibility. Starting automated extraction.")
 
-    def parse_row(self, row_element) -> Optional[Dict]:
+    def resume_session(self, search_box) -> bool:
+        """Submits the search with the saved cookies and reports whether the results table appeared."""
+        try:
+            search_box.send_keys(Keys.RETURN)
+            WebDriverWait(self.driver, SESSION_CHECK_TIMEOUT).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "table tbody tr"))
+            )
+            return True
+        except (TimeoutException, WebDriverException):
+            logging.info("Saved session was not enough to search. Falling back to manual bypass.")
+            return False
+
+    def block_resources(self):
+        """Stops the browser from fetching images, fonts, stylesheets and trackers."""
+        try:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+            logging.info("Blocking non-essential resources for the automated scrape.")
+        except Exception as e:
+            logging.warning(f"Could not enable resource blocking: {e}")
+
+    def run_script(self, expression: str, await_promise: bool = False):
         """
-        Separation of Logic: Extracts text data from a specific <tr> element.
-        Uses JavaScript execution to bypass potential visibility/rendering issues.
+        Runs one of the in-page scripts via CDP and returns its value by value.
+        With await_promise, a Promise result is awaited in-browser and its resolved value returned.
+        The expression is compiled once and then executed by script id.
         """
-        try:
-            # JavaScript is used to ensure all text content is captured, 
-            # even if hidden by CSS or deeply nested.
-            cells = self.driver.execute_script("""
-                var cells = arguments[0].getElementsByTagName('td');
-                var texts = [];
-                for(var i=0; i<cells.length; i++){
-                    texts.push(cells[i].textContent.trim());
-                }
-                return texts;
-            """, row_element)
+        script_id = self._script_ids.get(expression)
+        if script_id is not None:
+            try:
+                return self._run_compiled(script_id, await_promise)
+            except WebDriverException:
+                # Compiled scripts die with their execution context, e.g. after a full navigation
+                logging.info("Recompiling in-page script for the new document.")
+        return self._run_compiled(self._compile(expression), await_promise)
+
+    def _compile(self, expression: str) -> str:
+        response = self.driver.execute_cdp_cmd(
+            "Runtime.compileScript",
+            {"expression": expression, "sourceURL": f"eni-scraper/{len(self._script_ids)}.js", "persistScript": True}
+        )
+        if "exceptionDetails" in response:
+            raise RuntimeError(f"In-page script failed to compile: {response['exceptionDetails'].get('text')}")
+        self._script_ids[expression] = response["scriptId"]
+        return response["scriptId"]
+
+    def _run_compiled(self, script_id: str, await_promise: bool):
+        response = self.driver.execute_cdp_cmd(
+            "Runtime.runScript",
+            {"scriptId": script_id, "returnByValue": True, "awaitPromise": await_promise}
+        )
+        return self._script_value(response)
 
+    @staticmethod
+    def _script_value(response: Dict):
+        if "exceptionDetails" in response:
+            raise RuntimeError(f"In-page script failed: {response['exceptionDetails'].get('text')}")
+        return response["result"].get("value")
+
+    def parse_row(self, cells: List[str]) -> Optional[Tuple[str, bytes]]:
+        """
+        Separation of Logic: Maps the cell texts of a single <tr> to a record.
+        The texts are collected in-browser (see JS_EXTRACT_ALL_ROWS) so no extra round-trip is needed here.
+        Returns (business_name, JSONL line) rendered straight from a template, with no intermediate dict.
+        """
+        try:
             if not cells or len(cells) < 1:
                 return None
 
             # Data Mapping based on table structure
             # Indices: 0=Name, 1=ID, 2=Status, 3=Date, 4+=Agent Info
-            data = {
-                "business_name": cells[0],
-                "registration_id": cells[1] if len(cells) > 1 else "N/A",
-                "status": cells[2] if len(cells) > 2 else "N/A",
-                "filing_date": cells[3] if len(cells) > 3 else "N/A",
-                "agent_details": " | ".join(cells[4:]) if len(cells) > 4 else "N/A"
-            }
+            fields = (
+                cells[0],
+                cells[1] if len(cells) > 1 else "N/A",
+                cells[2] if len(cells) > 2 else "N/A",
+                cells[3] if len(cells) > 3 else "N/A",
+                " | ".join(cells[4:]) if len(cells) > 4 else "N/A"
+            )
+            template = _RECORD_TEMPLATE
             
             # Refined parsing for agent columns if structure allows
             if len(cells) >= 7:
-                 data["agent_name"] = cells[4]
-                 data["agent_address"] = cells[5]
-                 data["agent_email"] = cells[6]
+                 fields += (cells[4], cells[5], cells[6])
+                 template = _RECORD_WITH_AGENT_TEMPLATE
 
-            return data
+            return cells[0], template % tuple(map(orjson.dumps, fields))
         except Exception as e:
             logging.error(f"Error parsing row: {e}")
             return None
 
-    def save_record(self, record: Dict):
+    def record_page_health(self, ok: bool):
+        """Counts consecutive clean pages; any throttling sign starts the count over."""
+        self._consecutive_ok = self._consecutive_ok + 1 if ok else 0
+
+    def polite_sleep(self):
         """
-        Appends a valid record to the JSONL output file.
-        Updates the in-memory set to prevent duplicates during this run.
+        Implements random delays to mimic human behavior (Rate Limiting).
+        The delay decays while pages keep loading cleanly and resets to BASE_DELAY after a throttling sign.
         """
-        if record["business_name"] in self.scraped_ids:
-            return 
-
-        try:
-            with open(OUTPUT_FILE, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(record) + "\n")
-            
-            self.scraped_ids.add(record["business_name"])
-            logging.info(f"Successfully scraped: {record['business_name']}")
-        except IOError as e:
-            logging.error(f"File I/O Error while saving: {e}")
+        delay = max(MIN_DELAY, BASE_DELAY * DELAY_DECAY ** self._consecutive_ok)
+        time.sleep(delay + random.uniform(0, DELAY_JITTER))
 
-    def polite_sleep(self):
-        """Implements random delays to mimic human behavior (Rate Limiting)."""
-        delay = random.uniform(2.0, 4.0)
-        time.sleep(delay)
+    def fetch_rows(self) -> Tuple[List[List[str]], bool, bool, bool]:
+        """
+        Bonus: Retry Logic for Page Load.
+        Waits for the current page's rows, retrying with exponential backoff. A script error raised
+        mid-transition (e.g. a destroyed execution context) counts as a failed attempt; if the last
+        attempt still errors, it is re-raised so a dead browser is not mistaken for the last page.
+        Returns (rows, clean, stale, throttled): clean means the first attempt succeeded without a
+        throttling sign; stale means the table never changed after Next, which waiting again cannot
+        fix, so it returns at once; throttled means captcha/rate-limit text replaced the table.
+        """
+        rows, throttled = [], False
+        for attempt in range(MAX_RETRIES):
+            error = None
+            try:
+                # Single round-trip: wait for the next page's table and serialize its rows in-browser.
+                result = self.run_script(JS_EXTRACT_ALL_ROWS, await_promise=True)
+                rows = result["rows"]
+                throttled = throttled or result["throttled"]
+                if rows:
+                    return rows, attempt == 0 and not throttled, False, throttled
+                if result["stale"]:
+                    return rows, False, True, throttled
+                logging.warning(f"Attempt {attempt + 1}/{MAX_RETRIES}: Table rows not found yet...")
+            except (RuntimeError, WebDriverException) as e:
+                rows, error = [], e
+                logging.warning(f"Attempt {attempt + 1}/{MAX_RETRIES}: Reading the table failed: {e}")
+            if attempt < MAX_RETRIES - 1:
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)
+        if error is not None:
+            raise RuntimeError(f"Reading the table still failed after {MAX_RETRIES} attempts: {error}") from error
+        return rows, False, False, throttled
 
-    def run(self):
-        """Main execution flow."""
-        self.setup_driver()
-        
+    def run(self) -> bool:
+        """
+        Main execution flow: scrapes every page until pagination ends.
+        Expects setup_driver and human_bypass_gate to have been called.
+        Returns False if the scrape stopped early, so the caller can report it.
+        """
         try:
-            self.human_bypass_gate()
+            self.block_resources()
             
             page = 1
+            backoffs = 0
+            reclicked = False
             while True:
                 logging.info(f"Processing Page {page}...")
                 
-                # Bonus: Retry Logic for Page Load
-                rows = []
-                for attempt in range(MAX_RETRIES):
-                    try:
-                        self.wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "table tbody tr")))
-                        rows = self.driver.find_elements(By.CSS_SELECTOR, "table tbody tr")
-                        if rows: break
-                    except TimeoutException:
-                        logging.warning(f"Attempt {attempt + 1}/{MAX_RETRIES}: Table rows not found yet...")
-                        time.sleep(2)
+                rows, clean, stale, throttled = self.fetch_rows()
+                self.record_page_health(clean)
                 
                 if not rows:
+                    if throttled and backoffs < MAX_RETRIES:
+                        backoffs += 1
+                        logging.warning(f"Page {page} looks throttled. Backing off before retrying it...")
+                        time.sleep(BASE_DELAY * 2 ** backoffs)
+                        continue
+                    if throttled:
+                        logging.error(f"Page {page} still throttled after {MAX_RETRIES} back-offs. Stopping.")
+                        return False
+                    if stale and not reclicked:
+                        # The click may have been swallowed mid-render; only a new click can turn the page
+                        reclicked = True
+                        logging.warning(f"Page {page} did not load after clicking Next. Clicking it again...")
+                        if self.run_script(JS_CLICK_NEXT):
+                            self.polite_sleep()
+                            continue
+                        logging.info("Next button disabled or not found. Pagination complete.")
+                        break
+                    if stale:
+                        logging.info(f"Table did not change after a second Next click. Assuming page {page - 1} was the last.")
+                        break
                     logging.info("No more data rows found. Assuming end of pagination.")
                     break
+                backoffs = 0
+                reclicked = False
 
                 # Extraction Loop
-                new_records_count = 0
-                for row in rows:
-                    record = self.parse_row(row)
-                    if record:
-                        self.save_record(record)
-                        new_records_count += 1
-                
+                records = [record for record in map(self.parse_row, rows) if record]
+                new_records_count = self.store.save_page(records)
+
                 if new_records_count == 0:
                     logging.warning(f"Page {page} processed but no new unique records found.")
 
                 # Pagination Logic
                 try:
-                    next_btns = self.driver.find_elements(By.XPATH, "//button[contains(text(), 'Next') or contains(., '>')]")
-                    if next_btns and next_btns[0].is_enabled():
-                        self.driver.execute_script("arguments[0].click();", next_btns[0])
+                    if self.run_script(JS_CLICK_NEXT):
                         page += 1
                         self.polite_sleep()
                     else:
@@ -212,16 +578,41 @@ class EniScraper:
                         break
                 except Exception as e:
                     logging.error(f"Pagination error: {e}")
-                    break
+                    return False
 
         except Exception as main_e:
             logging.critical(f"Critical execution failure: {main_e}")
+            return False
+        return True
+
+    def quit(self):
+        """Closes the browser session."""
+        if self.driver:
+            logging.info("Closing browser session.")
+            self.driver.quit()
+            self.driver = None
+
+def main():
+    """Opens the output, passes the manual gate, then scrapes until pagination ends."""
+    store = RecordStore()
+    scraper = EniScraper(store)
+    
+    try:
+        store.open()
+        scraper.setup_driver()
+        scraper.human_bypass_gate()
+        if not scraper.run():
+            logging.error("Scrape did not reach the last page. Run the scraper again to resume it.")
+    except KeyboardInterrupt:
+        logging.warning("Interrupted by user. Records already queued are still written; run again to resume.")
+    except Exception as main_e:
+        logging.critical(f"Critical execution failure: {main_e}")
+    finally:
+        # Close the browser first so an interrupt stops page loads at once, then drain the writer
+        try:
+            scraper.quit()
         finally:
-            if self.driver:
-                logging.info("Closing browser session.")
-                self.driver.quit()
+            store.close()
 
 if __name__ == "__main__":
-    scraper = EniScraper()
-
-    scraper.run()
+    main()